@@ -0,0 +1,137 @@
+"""
+HematoVision - Admission Control
+Bounded in-flight/queue limits and request deadlines for the prediction path
+"""
+
+import math
+import threading
+import time
+
+class Overloaded(Exception):
+    """Raised when the prediction queue is full"""
+
+    def __init__(self, retry_after):
+        super().__init__("Server overloaded")
+        self.retry_after = retry_after
+
+class DeadlineExceeded(Exception):
+    """Raised when a request expired before inference started"""
+
+# Longest deadline a client may request when the server default is disabled
+MAX_DEADLINE_MS = 5 * 60 * 1000
+
+def parse_deadline(timeout_ms, default_ms):
+    """Return an absolute monotonic deadline from a relative timeout in milliseconds
+
+    Client values that are not finite and positive fall back to default_ms;
+    valid ones are capped at default_ms (or MAX_DEADLINE_MS if that is 0), so
+    a client can shorten its deadline but never extend or disable it.
+    """
+    limit = default_ms if default_ms > 0 else MAX_DEADLINE_MS
+    try:
+        requested = float(timeout_ms)
+    except (TypeError, ValueError):
+        requested = None
+
+    if requested is not None and math.isfinite(requested) and requested > 0:
+        timeout_ms = min(requested, limit)
+    else:
+        timeout_ms = default_ms
+
+    if timeout_ms <= 0:
+        return None
+    return time.monotonic() + timeout_ms / 1000.0
+
+class AdmissionController:
+    """Admit, queue and shed prediction requests
+
+    At most ``max_inflight`` requests run inference at once and at most
+    ``max_queue`` more wait for a slot; anything beyond that is rejected
+    immediately. Waiting requests whose deadline passes are dropped before
+    they reach the model.
+    """
+
+    def __init__(self, max_inflight, max_queue):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self._slots = threading.BoundedSemaphore(max_inflight)
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._inflight = 0
+        self._rejected = 0
+        self._expired = 0
+        self._completed = 0
+        self._service_time = 0.0
+
+    def check(self):
+        """Raise Overloaded if no place is free, without reserving one
+
+        Lets a front-end reject before reading an upload; admit() must still
+        be called once the request is ready for inference.
+        """
+        with self._lock:
+            if self._admitted >= self.max_inflight + self.max_queue:
+                self._rejected += 1
+                raise Overloaded(self._retry_after())
+
+    def admit(self):
+        """Reserve a place in the queue or raise Overloaded"""
+        with self._lock:
+            if self._admitted >= self.max_inflight + self.max_queue:
+                self._rejected += 1
+                raise Overloaded(self._retry_after())
+            self._admitted += 1
+
+    def release(self):
+        """Give back a place reserved by admit()"""
+        with self._lock:
+            self._admitted -= 1
+
+    def run(self, func, *args, deadline=None):
+        """Run func in an in-flight slot unless the deadline expires first
+
+        The caller must already hold a place from admit().
+        """
+        timeout = None if deadline is None else min(deadline - time.monotonic(), threading.TIMEOUT_MAX)
+        if (timeout is not None and timeout <= 0) or not self._slots.acquire(timeout=timeout):
+            self._expire()
+        try:
+            if deadline is not None and time.monotonic() >= deadline:
+                self._expire()
+            with self._lock:
+                self._inflight += 1
+            started = time.monotonic()
+            try:
+                return func(*args)
+            finally:
+                elapsed = time.monotonic() - started
+                with self._lock:
+                    self._inflight -= 1
+                    self._completed += 1
+                    # Exponential moving average used to size Retry-After
+                    self._service_time = elapsed if self._completed == 1 else 0.9 * self._service_time + 0.1 * elapsed
+        finally:
+            self._slots.release()
+
+    def _expire(self):
+        with self._lock:
+            self._expired += 1
+        raise DeadlineExceeded("Request deadline exceeded before inference")
+
+    def _retry_after(self):
+        # Time to drain the current backlog, at least one second
+        backlog = self._admitted / max(self.max_inflight, 1)
+        return max(1, math.ceil(backlog * self._service_time))
+
+    def stats(self):
+        """Queue depth and shedding counters for /health"""
+        with self._lock:
+            return {
+                'inflight': self._inflight,
+                'queue_depth': self._admitted - self._inflight,
+                'max_inflight': self.max_inflight,
+                'max_queue': self.max_queue,
+                'rejected': self._rejected,
+                'expired': self._expired,
+                'completed': self._completed
+            }
@@ -4,6 +4,16 @@ Blood Cell Classification System with AI Model Support
 """
 
 from flask import Flask, render_template, request, jsonify
+from dotenv import load_dotenv
+from runtime_threads import resolve_thread_config, configure_environment, apply_thread_config
+
+# Load environment variables
+load_dotenv()
+
+# Size thread pools BEFORE numpy/TensorFlow start their runtimes
+THREAD_CONFIG = resolve_thread_config()
+configure_environment(THREAD_CONFIG)
+
 import tensorflow as tf
 from tensorflow import keras
 import numpy as np
@@ -17,13 +27,11 @@ import io
 from PIL import Image
 import matplotlib
 matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import base64
 import logging
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
+from image_decode import decode_image, ImageTooLarge
+from admission import AdmissionController, Overloaded, DeadlineExceeded, parse_deadline
 
 # Configure logging
 logging.basicConfig(
@@ -46,6 +54,14 @@ MODEL = None
 CLASS_NAMES = ['Eosinophils', 'Lymphocytes', 'Monocytes', 'Neutrophils']
 IMG_SIZE = 224
 
+# Admission control for the prediction path
+ADMISSION = AdmissionController(
+    max_inflight=int(os.getenv('MAX_INFLIGHT', 2)),
+    max_queue=int(os.getenv('MAX_QUEUE', 16))
+)
+REQUEST_DEADLINE_MS = int(os.getenv('REQUEST_DEADLINE_MS', 30000))
+DEADLINE_HEADER = 'X-Request-Timeout-Ms'
+
 # Cell descriptions
 CELL_DESCRIPTIONS = {
     'Eosinophils': {
@@ -76,7 +92,7 @@ CELL_DESCRIPTIONS = {
 
 def load_model(model_path=None):
     """Load pre-trained model"""
-    global MODEL
+    global MODEL, IMG_SIZE
     if MODEL is None:
         if model_path is None:
             model_path = os.getenv('MODEL_PATH', 'models/EfficientNetB0_best.h5')
@@ -86,8 +102,11 @@ def load_model(model_path=None):
             return False
         
         try:
+            apply_thread_config(THREAD_CONFIG)
             MODEL = keras.models.load_model(model_path)
-            logger.info(f"Model loaded successfully: {model_path}")
+            # Distilled students may use a smaller input than the default
+            IMG_SIZE = MODEL.input_shape[1] or IMG_SIZE
+            logger.info(f"Model loaded successfully: {model_path} ({IMG_SIZE}x{IMG_SIZE} input)")
         except Exception as e:
             logger.error(f"Failed to load model: {e}")
             return False
@@ -98,18 +117,19 @@ def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
-def preprocess_image(image_path):
-    """Preprocess image for prediction"""
+def preprocess_image(source):
+    """Preprocess an image path or encoded bytes for prediction"""
     try:
-        img = cv2.imread(image_path)
+        img = decode_image(source, IMG_SIZE)
         if img is None:
             return None
         
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
         img = cv2.resize(img, (IMG_SIZE, IMG_SIZE))
         img = img / 255.0
         
         return np.expand_dims(img, axis=0)
+    except ImageTooLarge:
+        raise
     except Exception as e:
         logger.error(f"Error preprocessing image: {e}")
         return None
@@ -119,11 +139,14 @@ def predict_cell_type(image_path):
     if MODEL is None:
         return None, None, None
     
+    return predict_preprocessed(preprocess_image(image_path))
+
+def predict_preprocessed(img_array):
+    """Predict blood cell type from a preprocessed image batch"""
+    if MODEL is None or img_array is None:
+        return None, None, None
+    
     try:
-        img_array = preprocess_image(image_path)
-        if img_array is None:
-            return None, None, None
-        
         predictions = MODEL.predict(img_array, verbose=0)
         pred_class = np.argmax(predictions[0])
         confidence = float(predictions[0][pred_class])
@@ -156,7 +179,10 @@ def generate_diagnostic_report(predicted_class, confidence, all_confidences, fil
 def create_confidence_chart(all_confidences):
     """Create confidence visualization"""
     try:
-        fig, ax = plt.subplots(figsize=(8, 6))
+        # Standalone Figure instead of pyplot state, so charts can be
+        # rendered concurrently from worker threads
+        fig = Figure(figsize=(8, 6))
+        ax = fig.subplots()
         
         classes = list(all_confidences.keys())
         scores = list(all_confidences.values())
@@ -173,20 +199,27 @@ def create_confidence_chart(all_confidences):
             ax.text(bar.get_x() + bar.get_width()/2., height,
                     f'{score:.1%}', ha='center', va='bottom', fontsize=11, fontweight='bold')
         
-        plt.xticks(rotation=45, ha='right')
-        plt.tight_layout()
+        ax.tick_params(axis='x', labelrotation=45)
+        for label in ax.get_xticklabels():
+            label.set_horizontalalignment('right')
+        fig.tight_layout()
         
         img_buffer = io.BytesIO()
-        plt.savefig(img_buffer, format='png', dpi=100, bbox_inches='tight')
+        fig.savefig(img_buffer, format='png', dpi=100, bbox_inches='tight')
         img_buffer.seek(0)
         img_base64 = base64.b64encode(img_buffer.getvalue()).decode()
-        plt.close()
         
         return f"data:image/png;base64,{img_base64}"
     except Exception as e:
         logger.error(f"Error creating chart: {e}")
         return None
 
+def overloaded_response(exc):
+    """503 response telling the client when to retry"""
+    response = jsonify({'error': 'Server busy, retry later'})
+    response.headers['Retry-After'] = str(exc.retry_after)
+    return response, 503
+
 @app.route('/')
 def index():
     """Home page"""
@@ -195,6 +228,14 @@ def index():
 @app.route('/predict', methods=['POST'])
 def predict():
     """API endpoint for prediction"""
+    # Deadline runs from arrival; reject early if already full, but only take
+    # a queue place once the upload is in, so slow uploads do not hold one
+    deadline = parse_deadline(request.headers.get(DEADLINE_HEADER), REQUEST_DEADLINE_MS)
+    try:
+        ADMISSION.check()
+    except Overloaded as e:
+        return overloaded_response(e)
+    
     try:
         if 'file' not in request.files:
             return jsonify({'error': 'No file provided'}), 400
@@ -213,8 +254,15 @@ def predict():
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         file.save(filepath)
         
-        # Predict
-        predicted_class, confidence, all_confidences = predict_cell_type(filepath)
+        # Predict, holding the queue place only until inference returns
+        ADMISSION.admit()
+        try:
+            img_array = preprocess_image(filepath)
+            predicted_class, confidence, all_confidences = ADMISSION.run(
+                predict_preprocessed, img_array, deadline=deadline
+            )
+        finally:
+            ADMISSION.release()
         
         if predicted_class is None:
             return jsonify({'error': 'Failed to process image'}), 500
@@ -235,6 +283,13 @@ def predict():
             'uploaded_file': filename
         }), 200
     
+    except Overloaded as e:
+        return overloaded_response(e)
+    except ImageTooLarge as e:
+        logger.warning(f"Rejected image: {e}")
+        return jsonify({'error': 'Image dimensions too large'}), 413
+    except DeadlineExceeded:
+        return jsonify({'error': 'Request deadline exceeded'}), 504
     except Exception as e:
         logger.error(f"Prediction error: {e}")
         return jsonify({'error': f'Error: {str(e)}'}), 500
@@ -252,6 +307,7 @@ def health():
     return jsonify({
         'status': 'ok',
         'model_loaded': MODEL is not None,
+        'admission': ADMISSION.stats(),
         'timestamp': datetime.now().isoformat()
     }), 200
 
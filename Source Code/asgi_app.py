@@ -0,0 +1,233 @@
+"""
+HematoVision - Async Serving Front-End
+ASGI entry point exposing the same routes as app.py without blocking on uploads
+Run with: uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+# Must come first: app.py loads .env and sizes BLAS/TensorFlow thread pools,
+# which only takes effect before numpy (imported by image_decode) is loaded.
+# Model, preprocessing and reporting are shared with the Flask application
+import app as hematovision
+
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.templating import Jinja2Templates
+from werkzeug.utils import secure_filename
+
+from image_decode import ImageTooLarge
+from admission import Overloaded, DeadlineExceeded, parse_deadline
+
+logger = logging.getLogger(__name__)
+
+# Executor pools: the event loop only parses requests, CPU-bound work is
+# handed to small bounded pools so thousands of idle connections cost nothing
+DECODE_WORKERS = int(os.getenv('DECODE_WORKERS', min(4, os.cpu_count() or 1)))
+
+decode_pool = ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix='decode')
+# One inference thread per in-flight slot (MAX_INFLIGHT)
+inference_pool = ThreadPoolExecutor(max_workers=hematovision.ADMISSION.max_inflight, thread_name_prefix='inference')
+
+UPLOAD_FOLDER = hematovision.app.config['UPLOAD_FOLDER']
+MAX_CONTENT_LENGTH = hematovision.app.config['MAX_CONTENT_LENGTH']
+
+templates = Jinja2Templates(directory=os.path.join(hematovision.app.root_path, hematovision.app.template_folder))
+
+class BodyTooLarge(Exception):
+    """Raised when a request body grows past MAX_CONTENT_LENGTH"""
+
+def limit_body(request, max_size):
+    """Request whose body stream aborts as soon as max_size bytes have arrived
+
+    Content-Length alone cannot be trusted, chunked uploads do not send it.
+    """
+    received = 0
+
+    async def receive():
+        nonlocal received
+        message = await request.receive()
+        if message['type'] == 'http.request':
+            received += len(message.get('body', b''))
+            if received > max_size:
+                raise BodyTooLarge()
+        return message
+
+    return Request(request.scope, receive)
+
+def save_upload(filepath, data):
+    """Write uploaded bytes to disk"""
+    with open(filepath, 'wb') as f:
+        f.write(data)
+
+def log_save_error(future):
+    """Retrieve a background save's outcome so failures are logged, not lost"""
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"Failed to save upload: {future.exception()}")
+
+def overloaded_response(exc):
+    """503 response telling the client when to retry"""
+    return JSONResponse(
+        {'error': 'Server busy, retry later'},
+        status_code=503,
+        headers={'Retry-After': str(exc.retry_after)}
+    )
+
+async def index(request):
+    """Home page"""
+    return templates.TemplateResponse(request, 'index.html')
+
+async def predict(request):
+    """API endpoint for prediction"""
+    # Deadline runs from arrival; reject early if already full, but only take
+    # a queue place once the upload is in memory, so slow uploads do not hold one
+    admission = hematovision.ADMISSION
+    deadline = parse_deadline(request.headers.get(hematovision.DEADLINE_HEADER), hematovision.REQUEST_DEADLINE_MS)
+    try:
+        admission.check()
+    except Overloaded as e:
+        return overloaded_response(e)
+
+    try:
+        content_length = request.headers.get('content-length')
+        if content_length:
+            try:
+                content_length = int(content_length)
+            except ValueError:
+                return JSONResponse({'error': 'Invalid Content-Length header'}, status_code=400)
+            if content_length > MAX_CONTENT_LENGTH:
+                return JSONResponse({'error': 'File too large'}, status_code=413)
+
+        async with limit_body(request, MAX_CONTENT_LENGTH).form(max_files=1) as form:
+            file = form.get('file')
+            if file is None or isinstance(file, str):
+                return JSONResponse({'error': 'No file provided'}, status_code=400)
+
+            if file.filename == '':
+                return JSONResponse({'error': 'No file selected'}, status_code=400)
+
+            if not hematovision.allowed_file(file.filename):
+                return JSONResponse({'error': 'Invalid file type. Use: png, jpg, jpeg'}, status_code=400)
+
+            # Spooled upload is read off the event loop
+            data = await file.read()
+
+        filename = secure_filename(file.filename)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_")
+        filename = timestamp + filename
+        filepath = os.path.join(UPLOAD_FOLDER, filename)
+
+        admission.admit()
+
+        loop = asyncio.get_running_loop()
+
+        # Save file in the background while decoding from memory
+        saved = loop.run_in_executor(None, save_upload, filepath, data)
+        saved.add_done_callback(log_save_error)
+
+        # Predict, holding the queue place only until inference returns
+        try:
+            img_array = await loop.run_in_executor(decode_pool, hematovision.preprocess_image, data)
+            predicted_class, confidence, all_confidences = await loop.run_in_executor(
+                inference_pool, lambda: admission.run(hematovision.predict_preprocessed, img_array, deadline=deadline)
+            )
+        finally:
+            admission.release()
+        await saved
+
+        if predicted_class is None:
+            return JSONResponse({'error': 'Failed to process image'}, status_code=500)
+
+        # Generate report
+        report = hematovision.generate_diagnostic_report(predicted_class, confidence, all_confidences, filename)
+
+        # Create chart
+        chart_base64 = await loop.run_in_executor(decode_pool, hematovision.create_confidence_chart, all_confidences)
+
+        return JSONResponse({
+            'success': True,
+            'predicted_cell': predicted_class,
+            'confidence': f"{confidence:.2%}",
+            'all_predictions': {k: f"{v:.2%}" for k, v in all_confidences.items()},
+            'report': report,
+            'chart': chart_base64,
+            'uploaded_file': filename
+        }, status_code=200)
+
+    except Overloaded as e:
+        return overloaded_response(e)
+    except BodyTooLarge:
+        return JSONResponse({'error': 'File too large'}, status_code=413)
+    except HTTPException as e:
+        # Malformed multipart body or too many files
+        return JSONResponse({'error': e.detail}, status_code=e.status_code)
+    except ImageTooLarge as e:
+        logger.warning(f"Rejected image: {e}")
+        return JSONResponse({'error': 'Image dimensions too large'}, status_code=413)
+    except DeadlineExceeded:
+        return JSONResponse({'error': 'Request deadline exceeded'}, status_code=504)
+    except Exception as e:
+        logger.error(f"Prediction error: {e}")
+        return JSONResponse({'error': f'Error: {str(e)}'}, status_code=500)
+
+async def cell_info(request):
+    """Get information about cell type"""
+    cell_type = request.path_params['cell_type']
+    if cell_type not in hematovision.CLASS_NAMES:
+        return JSONResponse({'error': 'Invalid cell type'}, status_code=400)
+    return JSONResponse(hematovision.CELL_DESCRIPTIONS.get(cell_type, {}), status_code=200)
+
+async def health(request):
+    """Health check endpoint"""
+    return JSONResponse({
+        'status': 'ok',
+        'model_loaded': hematovision.MODEL is not None,
+        'admission': hematovision.ADMISSION.stats(),
+        'timestamp': datetime.now().isoformat()
+    }, status_code=200)
+
+async def not_found(request, exc):
+    """Handle 404 errors"""
+    return JSONResponse({'error': 'Endpoint not found'}, status_code=404)
+
+async def internal_error(request, exc):
+    """Handle 500 errors"""
+    return JSONResponse({'error': 'Internal server error'}, status_code=500)
+
+@asynccontextmanager
+async def lifespan(app):
+    """Load the model on startup and release executor pools on shutdown"""
+    loop = asyncio.get_running_loop()
+    if await loop.run_in_executor(inference_pool, hematovision.load_model):
+        logger.info("✓ ASGI app initialized successfully")
+    else:
+        logger.error("✗ Failed to load model")
+    yield
+    decode_pool.shutdown(wait=False, cancel_futures=True)
+    inference_pool.shutdown(wait=False, cancel_futures=True)
+
+app = Starlette(
+    routes=[
+        Route('/', index),
+        Route('/predict', predict, methods=['POST']),
+        Route('/info/{cell_type}', cell_info),
+        Route('/health', health),
+    ],
+    exception_handlers={404: not_found, 500: internal_error},
+    lifespan=lifespan,
+)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    host = os.getenv('HOST', '0.0.0.0')
+    port = int(os.getenv('PORT', 5000))
+    uvicorn.run(app, host=host, port=port)
@@ -0,0 +1,159 @@
+"""
+HematoVision - Inference Thread Calibration
+Sweeps TensorFlow thread settings on this machine and saves the fastest
+Run: python calibrate_threads.py --workers 4
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+from runtime_threads import thread_config_path, auto_thread_config, available_cores, configure_environment
+
+# Load environment variables
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def candidate_configs(workers, cores):
+    """Intra/inter-op combinations worth measuring for this host"""
+    per_worker = max(1, cores // workers)
+    intra_options = {per_worker}
+    n = 1
+    while n <= cores:
+        intra_options.add(n)
+        n *= 2
+
+    configs = []
+    for intra in sorted(intra_options):
+        for inter in (1, 2):
+            config = auto_thread_config(workers, cores)
+            config.update({'intra_op_threads': intra, 'inter_op_threads': inter, 'blas_threads': intra})
+            configs.append(config)
+    return configs
+
+def run_benchmark_worker(config, model_path, duration):
+    """Child process: load the model, wait for the start signal, count predictions"""
+    configure_environment(config)
+
+    import numpy as np
+    from tensorflow import keras
+    from runtime_threads import apply_thread_config
+
+    apply_thread_config(config)
+    model = keras.models.load_model(model_path)
+    batch = np.random.rand(1, *model.input_shape[1:]).astype('float32')
+
+    # Warm up before signalling readiness
+    for _ in range(3):
+        model.predict(batch, verbose=0)
+    print('ready', flush=True)
+    sys.stdin.readline()
+
+    latencies = []
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        started = time.perf_counter()
+        model.predict(batch, verbose=0)
+        latencies.append(time.perf_counter() - started)
+
+    latencies.sort()
+    print(json.dumps({
+        'predictions': len(latencies),
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000
+    }), flush=True)
+
+def measure(config, model_path, duration):
+    """Run one process per server worker concurrently and aggregate throughput"""
+    command = [
+        sys.executable, __file__, '--benchmark-worker',
+        '--config', json.dumps(config), '--model', model_path, '--duration', str(duration)
+    ]
+    # Each child pins its own thread settings, so drop any inherited overrides
+    env = {k: v for k, v in os.environ.items()
+           if k not in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                        'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS')}
+    procs = [
+        subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, env=env)
+        for _ in range(config['workers'])
+    ]
+
+    try:
+        # Start all workers together so they contend for cores like real servers
+        for proc in procs:
+            if proc.stdout.readline().strip() != 'ready':
+                raise RuntimeError("Benchmark worker failed to start")
+        for proc in procs:
+            proc.stdin.write('go\n')
+            proc.stdin.flush()
+
+        results = [json.loads(proc.stdout.readline()) for proc in procs]
+    except Exception:
+        for proc in procs:
+            proc.kill()
+        raise
+    finally:
+        for proc in procs:
+            proc.wait()
+
+    return {
+        'throughput': sum(r['predictions'] for r in results) / duration,
+        'p95_ms': max(r['p95_ms'] for r in results)
+    }
+
+def main():
+    """Sweep thread settings and write the best configuration"""
+    parser = argparse.ArgumentParser(description="Calibrate inference thread pools")
+    parser.add_argument('--model', default=os.getenv('MODEL_PATH', 'models/EfficientNetB0_best.h5'))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('SERVER_WORKERS', 1)),
+                        help="Serving processes that will share this host")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds to measure each setting")
+    parser.add_argument('--output', default=thread_config_path())
+    parser.add_argument('--benchmark-worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--config', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.benchmark_worker:
+        run_benchmark_worker(json.loads(args.config), args.model, args.duration)
+        return
+
+    print("\n" + "="*70)
+    print("HematoVision - Inference Thread Calibration")
+    print("="*70 + "\n")
+
+    if not os.path.exists(args.model):
+        logger.error(f"Model not found at {args.model}")
+        return
+
+    cores = available_cores()
+    logger.info(f"Calibrating for {args.workers} worker(s) on {cores} core(s)")
+
+    best = None
+    for config in candidate_configs(args.workers, cores):
+        result = measure(config, args.model, args.duration)
+        logger.info(
+            f"intra_op={config['intra_op_threads']:>2} inter_op={config['inter_op_threads']}: "
+            f"{result['throughput']:.1f} img/s, p95 {result['p95_ms']:.1f} ms"
+        )
+        if best is None or result['throughput'] > best['throughput']:
+            best = dict(config, **result)
+
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(best, f, indent=2)
+
+    logger.info(
+        f"✓ Best: intra_op={best['intra_op_threads']} inter_op={best['inter_op_threads']} "
+        f"({best['throughput']:.1f} img/s), saved to {args.output}"
+    )
+
+if __name__ == '__main__':
+    main()
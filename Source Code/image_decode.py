@@ -0,0 +1,58 @@
+"""
+HematoVision - Image Decoding
+Header-first, reduced-resolution decoding of uploaded images
+"""
+
+import io
+import os
+
+import numpy as np
+from PIL import Image, ImageOps
+
+# Default for the largest image (width x height) accepted for decoding,
+# overridden by MAX_IMAGE_PIXELS in the environment
+DEFAULT_MAX_IMAGE_PIXELS = 40_000_000
+
+# Integer modes PIL uses for 16-bit greyscale (e.g. microscope PNGs)
+HIGH_BIT_DEPTH_MODES = ('I;16', 'I;16L', 'I;16B', 'I')
+
+class ImageTooLarge(Exception):
+    """Raised when an image exceeds the configured pixel limit"""
+
+def to_rgb8(gray):
+    """Scale 16-bit greyscale to 8-bit RGB, as cv2.imread(IMREAD_COLOR) does"""
+    gray = np.clip(gray.astype(np.int64) >> 8, 0, 255).astype(np.uint8)
+    return np.repeat(gray[..., np.newaxis], 3, axis=2)
+
+def decode_image(source, target_size, max_pixels=None):
+    """Decode an image path or bytes into an RGB array close to target_size
+
+    Only the header is parsed before the pixel limit is checked, so oversized
+    images are rejected without allocating the full bitmap. JPEGs are decoded
+    with DCT scaling (1/2, 1/4 or 1/8) to the smallest scale that still covers
+    target_size; other formats decode at full size. Returns None if the data
+    is not a readable image.
+    """
+    if max_pixels is None:
+        # Read per call so a .env loaded after import still applies
+        max_pixels = int(os.getenv('MAX_IMAGE_PIXELS', DEFAULT_MAX_IMAGE_PIXELS))
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+
+    try:
+        # Only the formats uploads are allowed in; never hand data to other decoders
+        with Image.open(source, formats=('JPEG', 'PNG')) as img:
+            width, height = img.size
+            if width * height > max_pixels:
+                raise ImageTooLarge(f"Image is {width}x{height}, limit is {max_pixels} pixels")
+
+            img.draft('RGB', (target_size, target_size))
+            # Match cv2.imread, which honours EXIF orientation
+            img = ImageOps.exif_transpose(img)
+            if img.mode in HIGH_BIT_DEPTH_MODES:
+                return to_rgb8(np.asarray(img))
+            return np.asarray(img.convert('RGB'))
+    except Image.DecompressionBombError as e:
+        raise ImageTooLarge(str(e))
+    except (OSError, ValueError, SyntaxError):
+        return None
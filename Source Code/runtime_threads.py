@@ -0,0 +1,108 @@
+"""
+HematoVision - Inference Thread Configuration
+Sizes TensorFlow, OpenCV and BLAS thread pools for the serving host
+"""
+
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THREAD_CONFIG_PATH = 'models/thread_config.json'
+
+# Environment overrides for individual settings
+ENV_OVERRIDES = {
+    'intra_op_threads': 'TF_INTRA_OP_THREADS',
+    'inter_op_threads': 'TF_INTER_OP_THREADS',
+    'opencv_threads': 'OPENCV_THREADS',
+    'blas_threads': 'BLAS_THREADS'
+}
+
+BLAS_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS')
+
+def available_cores():
+    """Number of cores this process may run on"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def thread_config_path():
+    """Where the calibrated configuration is stored, read after .env is loaded"""
+    return os.getenv('THREAD_CONFIG_PATH', DEFAULT_THREAD_CONFIG_PATH)
+
+def server_workers():
+    """Number of serving processes sharing the host"""
+    return max(1, int(os.getenv('SERVER_WORKERS', 1)))
+
+def auto_thread_config(workers=None, cores=None):
+    """Split the host's cores evenly between serving workers"""
+    workers = workers or server_workers()
+    cores = cores or available_cores()
+    per_worker = max(1, cores // workers)
+
+    return {
+        'workers': workers,
+        'cores': cores,
+        'intra_op_threads': per_worker,
+        'inter_op_threads': 2 if per_worker >= 4 else 1,
+        # Only a single resize per request, more threads just contend with TF
+        'opencv_threads': 1,
+        'blas_threads': per_worker
+    }
+
+def load_thread_config(path=None):
+    """Load a calibrated configuration, or None if missing or for another host layout"""
+    path = path or thread_config_path()
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path) as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring thread config {path}: {e}")
+        return None
+
+    if config.get('workers') != server_workers() or config.get('cores') != available_cores():
+        logger.warning(f"Ignoring thread config {path}: calibrated for a different worker/core count")
+        return None
+
+    return config
+
+def resolve_thread_config(path=None):
+    """Calibrated config if present, else auto-tuned, with environment overrides applied"""
+    config = auto_thread_config()
+    config.update(load_thread_config(path) or {})
+
+    for key, env_var in ENV_OVERRIDES.items():
+        if os.getenv(env_var):
+            config[key] = int(os.getenv(env_var))
+
+    return config
+
+def configure_environment(config):
+    """Set thread environment variables; must run before numpy/TensorFlow are imported"""
+    for env_var in BLAS_ENV_VARS:
+        os.environ.setdefault(env_var, str(config['blas_threads']))
+    os.environ.setdefault('TF_NUM_INTRAOP_THREADS', str(config['intra_op_threads']))
+    os.environ.setdefault('TF_NUM_INTEROP_THREADS', str(config['inter_op_threads']))
+
+def apply_thread_config(config):
+    """Apply thread limits to the TensorFlow and OpenCV runtimes"""
+    import cv2
+    import tensorflow as tf
+
+    cv2.setNumThreads(config['opencv_threads'])
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(config['intra_op_threads'])
+        tf.config.threading.set_inter_op_parallelism_threads(config['inter_op_threads'])
+    except RuntimeError as e:
+        # TensorFlow runtime already initialized, env vars set earlier still apply
+        logger.warning(f"Could not set TensorFlow thread pools: {e}")
+
+    logger.info(
+        f"Inference threads: intra_op={config['intra_op_threads']}, inter_op={config['inter_op_threads']}, "
+        f"opencv={config['opencv_threads']}, blas={config['blas_threads']}"
+    )
@@ -3,13 +3,18 @@ HematoVision - Streamlit Alternative Interface
 Run with: streamlit run streamlit_app.py
 """
 
+import os
 import streamlit as st
 import tensorflow as tf
 from tensorflow import keras
 import numpy as np
 import cv2
-from PIL import Image
 import matplotlib.pyplot as plt
+from dotenv import load_dotenv
+from image_decode import decode_image, ImageTooLarge
+
+# Load environment variables
+load_dotenv()
 
 st.set_page_config(page_title="HematoVision", layout="wide", initial_sidebar_state="expanded")
 
@@ -22,8 +27,9 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Configuration
-MODEL_PATH = 'models/EfficientNetB0_best.h5'
+MODEL_PATH = os.getenv('MODEL_PATH', 'models/EfficientNetB0_best.h5')
 IMG_SIZE = 224
+PREVIEW_SIZE = 800
 CLASS_NAMES = ['Eosinophils', 'Lymphocytes', 'Monocytes', 'Neutrophils']
 COLORS = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A']
 
@@ -59,24 +65,33 @@ def main():
     st.sidebar.markdown("## Configuration")
     uploaded_file = st.sidebar.file_uploader("Upload Blood Cell Image", type=['jpg', 'jpeg', 'png'])
     
+    # Decode once at reduced resolution, rejecting oversized images from the
+    # header; the preview already covers the model input and is resized below
+    preview = None
+    if uploaded_file:
+        model = load_model()
+        img_size = model.input_shape[1] or IMG_SIZE
+        try:
+            preview = decode_image(uploaded_file.getvalue(), max(PREVIEW_SIZE, img_size))
+        except ImageTooLarge:
+            st.sidebar.error("Image dimensions too large")
+        else:
+            if preview is None:
+                st.sidebar.error("Could not read image")
+    
     # Main content
     col1, col2 = st.columns([1, 1])
     
     with col1:
         st.markdown("## Upload Image")
-        if uploaded_file:
-            image = Image.open(uploaded_file)
-            st.image(image, caption="Uploaded Image", use_column_width=True)
+        if preview is not None:
+            st.image(preview, caption="Uploaded Image", use_column_width=True)
     
     with col2:
         st.markdown("## Results")
-        if uploaded_file:
-            # Load model
-            model = load_model()
-            
+        if preview is not None:
             # Preprocess
-            image_np = np.array(Image.open(uploaded_file))
-            image_np = cv2.resize(image_np, (IMG_SIZE, IMG_SIZE))
+            image_np = cv2.resize(preview, (img_size, img_size))
             image_np = image_np / 255.0
             image_batch = np.expand_dims(image_np, axis=0)
             
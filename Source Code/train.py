@@ -1,22 +1,277 @@
 """
 HematoVision - Training Module
+Distill a compact serving model: python train.py --distill --student mobilenetv3small
 """
 
+import argparse
+import gzip
+import json
 import logging
+import os
+import shutil
+import time
 from pathlib import Path
 
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from tensorflow.keras import layers
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+CLASS_NAMES = ['Eosinophils', 'Lymphocytes', 'Monocytes', 'Neutrophils']
+TEACHER_IMG_SIZE = 224
+
+def load_datasets(dataset_path, batch_size, seed=123):
+    """Training and validation splits scaled to [0, 1] at the teacher's input size"""
+    train_ds, val_ds = keras.utils.image_dataset_from_directory(
+        dataset_path,
+        class_names=CLASS_NAMES,
+        image_size=(TEACHER_IMG_SIZE, TEACHER_IMG_SIZE),
+        batch_size=batch_size,
+        validation_split=0.2,
+        subset='both',
+        seed=seed
+    )
+
+    def scale(images, labels):
+        return images / 255.0, labels
+
+    def augment(images, labels):
+        # Cells have no canonical orientation
+        images = tf.image.random_flip_left_right(images)
+        images = tf.image.random_flip_up_down(images)
+        return images, labels
+
+    train_ds = train_ds.map(scale).map(augment).prefetch(tf.data.AUTOTUNE)
+    val_ds = val_ds.map(scale).cache().prefetch(tf.data.AUTOTUNE)
+    return train_ds, val_ds
+
+def build_student(architecture, img_size, weights=None):
+    """Compact classifier taking [0, 1] RGB input like the teacher"""
+    inputs = keras.Input(shape=(img_size, img_size, 3))
+
+    if architecture == 'mobilenetv3small':
+        x = layers.Rescaling(2.0, offset=-1.0)(inputs)
+        backbone = keras.applications.MobileNetV3Small(
+            input_shape=(img_size, img_size, 3),
+            include_top=False,
+            weights=weights,
+            pooling='avg',
+            include_preprocessing=False
+        )
+        x = backbone(x)
+    elif architecture == 'cnn':
+        x = inputs
+        for filters in (16, 32, 64, 128):
+            x = layers.Conv2D(filters, 3, padding='same', use_bias=False)(x)
+            x = layers.BatchNormalization()(x)
+            x = layers.ReLU()(x)
+            x = layers.MaxPooling2D()(x)
+        x = layers.GlobalAveragePooling2D()(x)
+    else:
+        raise ValueError(f"Unknown student architecture: {architecture}")
+
+    x = layers.Dropout(0.2)(x)
+    logits = layers.Dense(len(CLASS_NAMES), name='logits')(x)
+    outputs = layers.Softmax(name='probabilities')(logits)
+    return keras.Model(inputs, outputs, name=f'{architecture}_student')
+
+def make_train_step(teacher, student_logits, optimizer, img_size, temperature, alpha):
+    """Distillation step: hard-label cross-entropy plus softened teacher KL"""
+    ce = keras.losses.SparseCategoricalCrossentropy(from_logits=True)
+    kl = keras.losses.KLDivergence()
+
+    @tf.function
+    def train_step(images, labels):
+        # Teacher outputs probabilities; log-probabilities act as its logits
+        teacher_probs = teacher(images, training=False)
+        soft_targets = tf.nn.softmax(tf.math.log(teacher_probs + 1e-8) / temperature)
+
+        student_images = tf.image.resize(images, (img_size, img_size))
+        with tf.GradientTape() as tape:
+            logits = student_logits(student_images, training=True)
+            hard_loss = ce(labels, logits)
+            soft_loss = kl(soft_targets, tf.nn.softmax(logits / temperature))
+            loss = alpha * hard_loss + (1 - alpha) * temperature ** 2 * soft_loss
+
+        grads = tape.gradient(loss, student_logits.trainable_variables)
+        optimizer.apply_gradients(zip(grads, student_logits.trainable_variables))
+        return loss
+
+    return train_step
+
+def prunable_kernels(model):
+    """Conv and dense kernels subject to magnitude pruning"""
+    kernels = []
+    for layer in model.layers:
+        if isinstance(layer, keras.Model):
+            kernels.extend(prunable_kernels(layer))
+        elif isinstance(layer, (layers.Conv2D, layers.Dense)):
+            kernels.append(layer.kernel)
+    return kernels
+
+def magnitude_masks(kernels, sparsity):
+    """Per-kernel masks zeroing the smallest-magnitude fraction of weights"""
+    masks = []
+    for kernel in kernels:
+        weights = np.abs(kernel.numpy())
+        threshold = np.percentile(weights, sparsity * 100)
+        masks.append((weights > threshold).astype(weights.dtype))
+    return masks
+
+def apply_masks(kernels, masks):
+    for kernel, mask in zip(kernels, masks):
+        kernel.assign(kernel.numpy() * mask)
+
+def evaluate_accuracy(model, val_ds, img_size):
+    """Top-1 accuracy on the validation split"""
+    correct = total = 0
+    for images, labels in val_ds:
+        if img_size != TEACHER_IMG_SIZE:
+            images = tf.image.resize(images, (img_size, img_size))
+        predictions = np.argmax(model.predict(images, verbose=0), axis=1)
+        correct += int(np.sum(predictions == labels.numpy()))
+        total += len(predictions)
+    return correct / max(total, 1)
+
+def measure_latency(model, img_size, runs=50):
+    """Median single-image latency in ms, as served by /predict"""
+    batch = np.random.rand(1, img_size, img_size, 3).astype('float32')
+    for _ in range(5):
+        model.predict(batch, verbose=0)
+
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        model.predict(batch, verbose=0)
+        timings.append((time.perf_counter() - started) * 1000)
+    return float(np.median(timings))
+
+def model_footprint(model, path):
+    """Parameter counts and on-disk size (raw and gzip, which shows pruning gains)"""
+    gz_path = f"{path}.gz"
+    with open(path, 'rb') as src, gzip.open(gz_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    gz_size = os.path.getsize(gz_path)
+    os.remove(gz_path)
+
+    return {
+        'params': int(model.count_params()),
+        'nonzero_params': int(sum(np.count_nonzero(w) for w in model.get_weights())),
+        'size_mb': os.path.getsize(path) / 1e6,
+        'gzip_size_mb': gz_size / 1e6
+    }
+
+def distill(args):
+    """Train a compact student on the teacher's soft labels, optionally pruned"""
+    if not os.path.exists(args.teacher):
+        logger.error(f"Teacher model not found at {args.teacher}")
+        return
+
+    train_ds, val_ds = load_datasets(args.dataset, args.batch_size)
+
+    teacher = keras.models.load_model(args.teacher)
+    teacher.trainable = False
+    logger.info(f"Teacher loaded: {args.teacher}")
+
+    student = build_student(args.student, args.input_size, args.student_weights)
+    student_logits = keras.Model(student.input, student.get_layer('logits').output)
+    optimizer = keras.optimizers.Adam(args.learning_rate)
+    train_step = make_train_step(teacher, student_logits, optimizer,
+                                 args.input_size, args.temperature, args.alpha)
+
+    for epoch in range(args.epochs):
+        losses = [float(train_step(images, labels)) for images, labels in train_ds]
+        val_acc = evaluate_accuracy(student, val_ds, args.input_size)
+        logger.info(f"Epoch {epoch + 1}/{args.epochs} - loss: {np.mean(losses):.4f} - val_accuracy: {val_acc:.4f}")
+
+    if args.prune_sparsity > 0:
+        # Gradual magnitude pruning: raise sparsity each epoch, fine-tune with masks held
+        kernels = prunable_kernels(student)
+        for epoch in range(args.prune_epochs):
+            sparsity = args.prune_sparsity * (epoch + 1) / args.prune_epochs
+            masks = magnitude_masks(kernels, sparsity)
+            apply_masks(kernels, masks)
+            losses = []
+            for images, labels in train_ds:
+                losses.append(float(train_step(images, labels)))
+                apply_masks(kernels, masks)
+            val_acc = evaluate_accuracy(student, val_ds, args.input_size)
+            logger.info(f"Prune epoch {epoch + 1}/{args.prune_epochs} - sparsity: {sparsity:.0%} - "
+                        f"loss: {np.mean(losses):.4f} - val_accuracy: {val_acc:.4f}")
+
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    student.save(args.output)
+    logger.info(f"Student saved: {args.output}")
+
+    # Report accuracy alongside latency and size
+    report = {}
+    for name, model, path, img_size in (
+        ('teacher', teacher, args.teacher, TEACHER_IMG_SIZE),
+        ('student', student, args.output, args.input_size)
+    ):
+        report[name] = {
+            'path': path,
+            'input_size': img_size,
+            'val_accuracy': evaluate_accuracy(model, val_ds, img_size),
+            'latency_ms': measure_latency(model, img_size),
+            **model_footprint(model, path)
+        }
+
+    teacher_stats, student_stats = report['teacher'], report['student']
+    report['speedup'] = teacher_stats['latency_ms'] / student_stats['latency_ms']
+    report['size_reduction'] = teacher_stats['gzip_size_mb'] / student_stats['gzip_size_mb']
+
+    report_path = str(Path(args.output).with_suffix('')) + '_report.json'
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print("\n" + "="*80)
+    print(f"{'Model':<10}{'Accuracy':>10}{'Latency (ms)':>15}{'Params':>12}{'Size (MB)':>12}{'gzip (MB)':>12}")
+    for name in ('teacher', 'student'):
+        r = report[name]
+        print(f"{name:<10}{r['val_accuracy']:>10.2%}{r['latency_ms']:>15.1f}{r['params']:>12,}"
+              f"{r['size_mb']:>12.1f}{r['gzip_size_mb']:>12.1f}")
+    print(f"\nSpeedup: {report['speedup']:.1f}x  Size reduction: {report['size_reduction']:.1f}x")
+    print(f"Report saved: {report_path}")
+    print(f"Serve it with: MODEL_PATH={args.output}")
+    print("="*80 + "\n")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="HematoVision training")
+    parser.add_argument('--dataset', default='dataset')
+    parser.add_argument('--distill', action='store_true', help="Distill a compact student from the teacher")
+    # Not MODEL_PATH: that may point at a distilled student being served
+    parser.add_argument('--teacher', default=os.getenv('TEACHER_MODEL_PATH', 'models/EfficientNetB0_best.h5'))
+    parser.add_argument('--student', choices=['mobilenetv3small', 'cnn'], default='mobilenetv3small')
+    parser.add_argument('--student-weights', default=None, help="e.g. 'imagenet' for a pretrained backbone")
+    parser.add_argument('--input-size', type=int, default=160)
+    parser.add_argument('--temperature', type=float, default=4.0)
+    parser.add_argument('--alpha', type=float, default=0.1, help="Weight of the hard-label loss")
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--learning-rate', type=float, default=1e-3)
+    parser.add_argument('--prune-sparsity', type=float, default=0.0, help="Final kernel sparsity, 0 disables")
+    parser.add_argument('--prune-epochs', type=int, default=3)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+
+    if args.output is None:
+        args.output = f"models/{args.student}_distilled.h5"
+    return args
+
 def main():
     """Main training pipeline"""
-    
+    args = parse_args()
+
     print("\n" + "="*80)
     print("HematoVision - Blood Cell Classification Training")
     print("="*80 + "\n")
-    
-    DATASET_PATH = 'dataset'
-    
+
+    DATASET_PATH = args.dataset
+
     # Check dataset
     if not Path(DATASET_PATH).exists():
         logger.error(f"Dataset not found at {DATASET_PATH}")
@@ -27,9 +282,13 @@ def main():
         print("    ├── Monocytes/")
         print("    └── Neutrophils/")
         return
-    
+
+    if args.distill:
+        distill(args)
+        return
+
     logger.info("Training module initialized")
     logger.info("Download dataset from: https://www.kaggle.com/datasets/obulisainaren/blood-cell-images")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()